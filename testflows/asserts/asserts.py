@@ -12,14 +12,19 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import re
 import ast
-import copy
+import bisect
+import sys
 import inspect
+import collections
 import pprint
+import operator
+import functools
 import difflib
 import textwrap
 import linecache
-import itertools
+import tokenize
 import builtins
 
 __all__ = ["error", "errors", "values"]
@@ -47,14 +52,88 @@ class values(object):
         pass
 
 
-class AssertEval(ast.NodeVisitor):
-    """Asssertion expression evaluator.
+# builtins namespace
+_builtins = vars(builtins)
 
-    :param frame: frame where the assertion occured
+# parsed assert expressions and their operator offsets keyed by (filename, lineno),
+# the least recently used entry is dropped once _expressions_maxsize is reached
+_expressions = collections.OrderedDict()
+_expressions_maxsize = 128
+
+
+@functools.lru_cache(maxsize=128)
+def _compile_expression(node):
+    """Return cached bytecode for the expression node.
+
+    Expression nodes are cached together with the parsed
+    assert statement and therefore the same node object
+    is used each time the same assertion fails.
+
+    :param node: expression node
+    """
+    return compile(ast.Expression(node), "assertion node", "eval")
+
+
+def _statement_lines(lines, lineno):
+    """Return the first and the last line number of the
+    logical line that contains the given line.
+
+    Returns None if the lines can't be tokenized.
+
+    :param lines: source lines starting from the first line of the code block
+    :param lineno: line number relative to the first line of the code block
+    """
+    readline = iter(lines).__next__
+    start = None
+    skip = (tokenize.NL, tokenize.COMMENT, tokenize.INDENT, tokenize.DEDENT)
+    try:
+        for token in tokenize.generate_tokens(readline):
+            if token.type == tokenize.NEWLINE or token.type == tokenize.ENDMARKER:
+                if start is not None and token.start[0] >= lineno:
+                    return start, token.start[0]
+                start = None
+            elif start is None and token.type not in skip:
+                if token.start[0] > lineno:
+                    return None
+                start = token.start[0]
+    except (tokenize.TokenError, SyntaxError):
+        pass
+    return None
+
+
+def _frame_info(frame, lineno=None):
+    """Return frame info with only the current line
+    as the code context.
+
+    Unlike inspect.getframeinfo() the source of the frame's
+    code is not searched for, the line is read from linecache.
+
+    :param frame: frame
+    :param lineno: line number, default: current line of the frame
+    """
+    if lineno is None:
+        lineno = frame.f_lineno
+    filename = frame.f_code.co_filename
+    line = linecache.getline(filename, lineno, frame.f_globals)
+    if not line:
+        return inspect.Traceback(filename, lineno, frame.f_code.co_name, None, None)
+    return inspect.Traceback(filename, lineno, frame.f_code.co_name, [line], 0)
+
+
+def _failed_frame(tb):
+    """Return the innermost frame of the traceback
+    where the exception was raised and its frame info.
+
+    :param tb: traceback
     """
+    while tb.tb_next is not None:
+        tb = tb.tb_next
+    return tb.tb_frame, _frame_info(tb.tb_frame, tb.tb_lineno)
 
-    # Known types
-    _simple = (
+
+# Known types
+_simple_types = frozenset(
+    (
         ast.Num,
         ast.Str,
         ast.NameConstant,
@@ -71,86 +150,148 @@ class AssertEval(ast.NodeVisitor):
         ast.Starred,
         ast.Compare,
     )
+)
+
+# Known constant value types
+_simple_constants = frozenset((int, float, complex, str, bool, type(None)))
+
+# maximum number of lines that are diffed using difflib
+_diff_max_lines = 2000
+
+# characters that str.splitlines() treats as line boundaries
+_line_breaks = re.compile(r"[\n\r\v\f\x1c\x1d\x1e\x85\u2028\u2029]")
+
+# operator symbols
+_op_symbols = {
+    # boolean ops
+    ast.And: "and",
+    ast.Or: "or",
+    # binary ops
+    ast.Add: "+",
+    ast.Sub: "-",
+    ast.Mult: "*",
+    ast.Div: "/",
+    ast.Mod: "%",
+    ast.Pow: "**",
+    ast.LShift: "<<",
+    ast.RShift: ">>",
+    ast.BitOr: "|",
+    ast.BitXor: "^",
+    ast.BitAnd: "&",
+    ast.FloorDiv: "//",
+    # compare ops
+    ast.Eq: "==",
+    ast.NotEq: "!=",
+    ast.Lt: "<",
+    ast.LtE: "<=",
+    ast.Gt: ">",
+    ast.GtE: ">=",
+    ast.Is: "is",
+    ast.IsNot: "is not",
+    ast.In: "in",
+    ast.NotIn: "not in",
+    # unary ops
+    ast.Invert: "~",
+    ast.Not: "not",
+    ast.UAdd: "+",
+    ast.USub: "-",
+}
+
+# patterns that match every, possibly overlapping, occurrence of an operator symbol
+_op_patterns = {
+    op_sym: re.compile("(?=%s)" % re.escape(op_sym))
+    for op_sym in set(_op_symbols.values())
+}
+
+# boolean operators
+_boolean_ops = {
+    ast.And: lambda left, right: left and right,
+    ast.Or: lambda left, right: left or right,
+}
+
+# binary operators
+_binary_ops = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+    ast.LShift: operator.lshift,
+    ast.RShift: operator.rshift,
+    ast.BitOr: operator.or_,
+    ast.BitXor: operator.xor,
+    ast.BitAnd: operator.and_,
+    ast.FloorDiv: operator.floordiv,
+}
+
+# unary operators
+_unary_ops = {
+    ast.Invert: operator.invert,
+    ast.Not: operator.not_,
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg,
+}
+
+# comparison operators
+_compare_ops = {
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+    ast.Is: operator.is_,
+    ast.IsNot: operator.is_not,
+    ast.In: lambda left, right: left in right,
+    ast.NotIn: lambda left, right: left not in right,
+}
+
+
+def _is_simple(node):
+    """Return `True` if the value of the node
+    does not need to be shown separately.
+
+    :param node: node
+    """
+    node_type = type(node)
+    if node_type is ast.Constant:
+        return type(node.value) in _simple_constants
+    return node_type in _simple_types
+
+
+def _mark_simple(tree):
+    """Set the `_is_simple` flag on every node of the tree
+    so that visitors do not need to check node types
+    each time the assertion is reinterpreted.
+
+    :param tree: parsed tree
+    """
+    for node in ast.walk(tree):
+        node._is_simple = _is_simple(node)
+    return tree
+
+
+def _visitor_table(cls):
+    """Return mapping of node types to the visitor
+    methods defined by the class.
+
+    :param cls: node visitor class
+    """
+    table = {}
+    for name in dir(cls):
+        if name.startswith("visit_"):
+            node_type = getattr(ast, name[len("visit_") :], None)
+            if isinstance(node_type, type):
+                table[node_type] = getattr(cls, name)
+    return table
+
 
-    # operator symbols
-    _op_symbols = {
-        # boolean ops
-        ast.And: "and",
-        ast.Or: "or",
-        # binary ops
-        ast.Add: "+",
-        ast.Sub: "-",
-        ast.Mult: "*",
-        ast.Div: "/",
-        ast.Mod: "%",
-        ast.Pow: "**",
-        ast.LShift: "<<",
-        ast.RShift: ">>",
-        ast.BitOr: "|",
-        ast.BitXor: "^",
-        ast.BitAnd: "&",
-        ast.FloorDiv: "//",
-        # compare ops
-        ast.Eq: "==",
-        ast.NotEq: "!=",
-        ast.Lt: "<",
-        ast.LtE: "<=",
-        ast.Gt: ">",
-        ast.GtE: ">=",
-        ast.Is: "is",
-        ast.IsNot: "is not",
-        ast.In: "in",
-        ast.NotIn: "not in",
-        # unary ops
-        ast.Invert: "~",
-        ast.Not: "not",
-        ast.UAdd: "+",
-        ast.USub: "-",
-    }
-
-    # boolean operators
-    _boolean_ops = {
-        ast.And: lambda left, right: left and right,
-        ast.Or: lambda left, right: left or right,
-    }
-
-    # binary operators
-    _binary_ops = {
-        ast.Add: lambda left, right: left + right,
-        ast.Sub: lambda left, right: left - right,
-        ast.Mult: lambda left, right: left * right,
-        ast.Div: lambda left, right: left / right,
-        ast.Mod: lambda left, right: left % right,
-        ast.Pow: lambda left, right: left**right,
-        ast.LShift: lambda left, right: left << right,
-        ast.RShift: lambda left, right: left >> right,
-        ast.BitOr: lambda left, right: left | right,
-        ast.BitXor: lambda left, right: left ^ right,
-        ast.BitAnd: lambda left, right: left & right,
-        ast.FloorDiv: lambda left, right: left // right,
-    }
-
-    # unary operators
-    _unary_ops = {
-        ast.Invert: lambda operand: ~operand,
-        ast.Not: lambda operand: not operand,
-        ast.UAdd: lambda operand: +operand,
-        ast.USub: lambda operand: -operand,
-    }
-
-    # comparison operators
-    _compare_ops = {
-        ast.Eq: lambda left, right: left == right,
-        ast.NotEq: lambda left, right: left != right,
-        ast.Lt: lambda left, right: left < right,
-        ast.LtE: lambda left, right: left <= right,
-        ast.Gt: lambda left, right: left > right,
-        ast.GtE: lambda left, right: left >= right,
-        ast.Is: lambda left, right: left is right,
-        ast.IsNot: lambda left, right: left is not right,
-        ast.In: lambda left, right: left in right,
-        ast.NotIn: lambda left, right: left not in right,
-    }
+class AssertEval(ast.NodeVisitor):
+    """Asssertion expression evaluator.
+
+    :param frame: frame where the assertion occured
+    """
 
     class FuncResult(object):
         """Result wrapper."""
@@ -171,6 +312,18 @@ class AssertEval(ast.NodeVisitor):
         def __repr__(self):
             return _saferepr(self.result) + "\n" + self.diff
 
+    class OperatorNode(object):
+        """Operator node with the position of the operator
+        inside the expression.
+        """
+
+        __slots__ = ("op", "lineno", "col_offset")
+
+        def __init__(self, op, lineno, col_offset):
+            self.op = op
+            self.lineno = lineno
+            self.col_offset = col_offset
+
     def __init__(self, frame, frame_info):
         def error(desc=None):
             pass
@@ -178,17 +331,35 @@ class AssertEval(ast.NodeVisitor):
         self.frame = frame
         self.frame_info = frame_info
         self.f_globals = self.frame.f_globals
-        self.f_locals = dict(self.frame.f_locals)
-        self.f_locals["error"] = error
+        self.f_locals = collections.ChainMap({"error": error}, self.frame.f_locals)
+        # scope used to resolve names
+        self._scope = collections.ChainMap(
+            *self.f_locals.maps, self.f_globals, _builtins
+        )
         self.nodes = []
         self.expression = None
-        self._is_assert = False
+        self._op_offsets = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._visitors = _visitor_table(cls)
+
+    def visit(self, node):
+        """Visit a node using the visitor method
+        looked up by the type of the node.
+
+        :param node: node
+        """
+        visitor = self._visitors.get(type(node))
+        if visitor is None:
+            return self.generic_visit(node)
+        return visitor(self, node)
 
     def eval(self):
         """Evaluate assert expression."""
         expression_ast = None
         if self.expression:
-            expression_ast = ast.parse(self.expression)
+            expression_ast = _mark_simple(ast.parse(self.expression))
         else:
             code = (
                 self.frame_info.code_context[0].strip()
@@ -196,23 +367,79 @@ class AssertEval(ast.NodeVisitor):
                 else None
             )
             if code is not None:
-                expression = ""
-                expression_ast = None
-                sourcelines, startline = inspect.getsourcelines(self.frame)
-                startline = max(1, startline)
-                for i in range(self.frame_info.lineno - startline + 1, 0, -1):
-                    expression = sourcelines[i - 1] + expression
-                    try:
-                        self.expression = textwrap.dedent(expression).strip()
-                        expression_ast = ast.parse(self.expression)
-                        break
-                    except SyntaxError as e:
-                        pass
-                self.expression = self.expression.split("\n")
+                filename, lineno = self.frame_info.filename, self.frame_info.lineno
+                linecache.checkcache(filename)
+                sourcelines = linecache.getlines(filename, self.f_globals)
+                if not sourcelines:
+                    # the source file is no longer available
+                    return self.expression, self.nodes
+                key = (filename, lineno)
+                cached = _expressions.get(key)
+                # linecache replaces the list of lines when the source changes
+                if cached is not None and cached[0] is sourcelines:
+                    _expressions.move_to_end(key)
+                    self.expression, expression_ast, self._op_offsets = cached[1:]
+                else:
+                    self.expression, expression_ast = self._parse(sourcelines)
+                    if expression_ast:
+                        _mark_simple(expression_ast)
+                    _expressions[key] = (
+                        sourcelines,
+                        self.expression,
+                        expression_ast,
+                        self._op_offsets,
+                    )
+                    _expressions.move_to_end(key)
+                    if len(_expressions) > _expressions_maxsize:
+                        _expressions.popitem(last=False)
         if expression_ast:
-            self.visit(expression_ast)
+            node = expression_ast.body[0]
+            if not isinstance(node, ast.Assert):
+                raise RuntimeError("not called from the assert statement")
+            self.visit(node)
         return self.expression, self.nodes
 
+    def _parse(self, sourcelines):
+        """Find and parse the assert statement that
+        ends on the current line of the frame.
+
+        :param sourcelines: source lines of the frame's file
+        """
+        startline = max(1, self.frame.f_code.co_firstlineno)
+        lineno = self.frame_info.lineno
+        # most assert statements fit on one line
+        try:
+            self.expression = sourcelines[lineno - 1].strip()
+            expression_ast = ast.parse(self.expression)
+            if isinstance(expression_ast.body[0], ast.Assert):
+                return (self.expression,), expression_ast
+        except SyntaxError:
+            pass
+        # otherwise find where the statement begins and ends in one pass
+        begin = startline - 1
+        bounds = _statement_lines(sourcelines[begin:], lineno - startline + 1)
+        if bounds is not None:
+            first, last = bounds
+            try:
+                self.expression = textwrap.dedent(
+                    "".join(sourcelines[begin + first - 1 : begin + last])
+                ).strip()
+                expression_ast = ast.parse(self.expression)
+                return tuple(self.expression.split("\n")), expression_ast
+            except SyntaxError:
+                pass
+        # last resort, grow the expression one line at a time
+        expression_ast = None
+        end = lineno
+        for i in range(end - 1, begin - 1, -1):
+            try:
+                self.expression = textwrap.dedent("".join(sourcelines[i:end])).strip()
+                expression_ast = ast.parse(self.expression)
+                break
+            except SyntaxError as e:
+                pass
+        return tuple(self.expression.split("\n")), expression_ast
+
     def _diff(self, op, result, left, right):
         """Return result that includes diff
         for a few left and right types.
@@ -237,17 +464,53 @@ class AssertEval(ast.NodeVisitor):
             else:
                 left_repr = pprint.pformat(left).splitlines()
                 right_repr = pprint.pformat(right).splitlines()
-            diff = "\n".join(
-                itertools.islice(
-                    difflib.unified_diff(left_repr, right_repr, n=0, lineterm=""),
-                    2,
-                    None,
+            if len(left_repr) + len(right_repr) > _diff_max_lines:
+                diff = self._first_diff(left_repr, right_repr)
+            else:
+                diff = list(
+                    difflib.unified_diff(left_repr, right_repr, n=0, lineterm="")
                 )
-            )
+                # skip the ---/+++ file header lines
+                diff = "\n".join(diff[2:])
             return self.DiffResult(result, diff)
 
         return result
 
+    def _first_diff(self, left, right, context=3):
+        """Return a diff that only shows the first
+        difference between left and right lines.
+
+        :param left: left side lines
+        :param right: right side lines
+        :param context: number of context lines, default: `3`
+        """
+        idx = 0
+        for idx, (left_line, right_line) in enumerate(zip(left, right)):
+            if left_line != right_line:
+                break
+        else:
+            idx = min(len(left), len(right))
+        lines = ["@@ -%d +%d @@" % (idx + 1, idx + 1)]
+        lines += [" " + line for line in left[max(idx - context, 0) : idx]]
+        lines += ["-" + line for line in left[idx : idx + 1]]
+        lines += ["+" + line for line in right[idx : idx + 1]]
+        lines.append("... (showing only the first difference)")
+        return "\n".join(lines)
+
+    def _operator_offsets(self, lineno, op_sym):
+        """Return sorted offsets of all occurrences
+        of the operator symbol on the expression line.
+
+        :param lineno: line number
+        :param op_sym: operator symbol
+        """
+        offsets = self._op_offsets.get((lineno, op_sym))
+        if offsets is None:
+            line = self.expression[lineno - 1]
+            offsets = [m.start() for m in _op_patterns[op_sym].finditer(line)]
+            self._op_offsets[(lineno, op_sym)] = offsets
+        return offsets
+
     def _find_operator(self, op_type, lineno, col_offset):
         """Find an operator offset which is right before
         the specified line number and column offset.
@@ -255,68 +518,65 @@ class AssertEval(ast.NodeVisitor):
         :param lineno: line number
         :param col_offset: column offset
         """
-        expression = self.expression[:lineno]
-        expression[-1] = expression[-1][: col_offset + 1].rstrip("({[")
-        op_sym = self._op_symbols.get(op_type, None)
-        if op_sym is None:
-            raise RuntimeError("unknown operator type '%s'" % op_type)
-        for lineno, line in reversed(list(enumerate(expression, 1))):
-            idx = line.rfind(op_sym)
-            if idx >= 0:
-                break
+        try:
+            op_sym = _op_symbols[op_type]
+        except KeyError:
+            raise RuntimeError("unknown operator type '%s'" % op_type) from None
+        line = self.expression[lineno - 1][: col_offset + 1].rstrip("({[")
+        offsets = self._operator_offsets(lineno, op_sym)
+        idx = bisect.bisect_right(offsets, len(line) - len(op_sym))
+        if idx > 0:
+            return lineno, offsets[idx - 1]
+        for lineno in range(lineno - 1, 0, -1):
+            offsets = self._operator_offsets(lineno, op_sym)
+            if offsets:
+                return lineno, offsets[-1]
         # if we did not find the operator returns (1, -1)
-        return lineno, idx
-
-    def visit_Module(self, node):
-        return self.visit(node.body[0])
-
-    def visit_Expr(self, node):
-        if not self._is_assert:
-            raise RuntimeError("not called from the assert statement")
-        return self.visit(node.value)
+        return 1, -1
 
     def visit_Assert(self, node):
-        self._is_assert = True
         result = bool(self.visit(node.test))
         self.nodes.append((result, node))
         return result
 
     def visit_Compare(self, node):
+        compare_ops = _compare_ops
+        append = self.nodes.append
         left = self.visit(node.left)
         result = left
-        if not isinstance(node.left, self._simple):
-            self.nodes.append((result, node.left))
-        for idx, operator, comparator in zip(
+        if not node.left._is_simple:
+            append((result, node.left))
+        for idx, op_node, comparator in zip(
             range(len(node.ops)), node.ops, node.comparators
         ):
-            op = type(operator)
-            func = self._compare_ops[op]
+            op = type(op_node)
+            func = compare_ops[op]
             right = self.visit(comparator)
             op_result = func(left, right)
             if idx > 0:
                 result = result and op_result
             else:
                 result = op_result
-            if not isinstance(comparator, self._simple):
-                self.nodes.append((right, comparator))
-            _operator = copy.copy(operator)
-            _operator.lineno, _operator.col_offset = self._find_operator(
-                op, comparator.lineno, comparator.col_offset
-            )
-            self.nodes.append(
-                (self.FuncResult(self._diff(op, op_result, left, right)), _operator)
+            if not comparator._is_simple:
+                append((right, comparator))
+            _operator = self.OperatorNode(
+                op_node,
+                *self._find_operator(op, comparator.lineno, comparator.col_offset)
             )
+            append((self.FuncResult(self._diff(op, op_result, left, right)), _operator))
             left = right
         return result
 
     def visit_Attribute(self, node):
+        append = self.nodes.append
         value = self.visit(node.value)
-        self.nodes.append((value, node))
+        append((value, node))
         res = getattr(value, node.attr)
-        self.nodes.append((self.FuncResult(res), node))
+        append((self.FuncResult(res), node))
         return res
 
     def visit_Call(self, node):
+        append = self.nodes.append
         if isinstance(node.func, ast.Name):
             name = node.func.id
         else:
@@ -324,25 +584,22 @@ class AssertEval(ast.NodeVisitor):
 
         if callable(name):
             func = name
-        elif name in self.f_locals:
-            func = self.f_locals[name]
-        elif name in self.f_globals:
-            func = self.f_globals[name]
-        elif getattr(builtins, name):
-            func = getattr(builtins, name)
         else:
-            raise NameError(
-                "Function '{}' is not defined".format(name),
-                node.lineno,
-                node.col_offset,
-            )
+            try:
+                func = self._scope[name]
+            except KeyError:
+                raise NameError(
+                    "Function '{}' is not defined".format(name),
+                    node.lineno,
+                    node.col_offset,
+                ) from None
 
         if isinstance(func, values):
             if func.stack:
                 result = func.stack.pop(0)
             else:
                 result = None
-            self.nodes.append((self.FuncResult(result), node))
+            append((self.FuncResult(result), node))
             return result
 
         starred = []
@@ -350,8 +607,8 @@ class AssertEval(ast.NodeVisitor):
         for arg in node.args:
             if isinstance(arg, ast.AST):
                 arg_value = self.visit(arg)
-            if not isinstance(arg, self._simple):
-                self.nodes.append((arg_value, arg))
+            if not arg._is_simple:
+                append((arg_value, arg))
             args.append(arg_value)
 
         if args and isinstance(args[-1], ast.Starred):
@@ -361,11 +618,11 @@ class AssertEval(ast.NodeVisitor):
         for keyword in node.keywords:
             keyword_value = self.visit(keyword.value)
             keywords[keyword.arg] = keyword_value
-            if not isinstance(keyword.value, self._simple):
-                self.nodes.append((keyword_value, keyword.value))
+            if not keyword.value._is_simple:
+                append((keyword_value, keyword.value))
 
         value = func(*args, *starred, **keywords)
-        self.nodes.append((self.FuncResult(value), node))
+        append((self.FuncResult(value), node))
         return value
 
     def visit_Starred(self, node):
@@ -373,117 +630,136 @@ class AssertEval(ast.NodeVisitor):
         return ast.Starred(result, node.ctx)
 
     def visit_BinOp(self, node):
+        append = self.nodes.append
         op = type(node.op)
-        func = self._binary_ops[op]
+        func = _binary_ops[op]
         left = self.visit(node.left)
-        if not isinstance(node.left, self._simple):
-            self.nodes.append((left, node.left))
+        if not node.left._is_simple:
+            append((left, node.left))
         right = self.visit(node.right)
-        if not isinstance(node.right, self._simple):
-            self.nodes.append((right, node.right))
+        if not node.right._is_simple:
+            append((right, node.right))
         result = func(left, right)
-        _operator = copy.copy(node.op)
-        _operator.lineno, _operator.col_offset = self._find_operator(
-            op, node.right.lineno, node.right.col_offset
+        _operator = self.OperatorNode(
+            node.op, *self._find_operator(op, node.right.lineno, node.right.col_offset)
         )
-        self.nodes.append((self.FuncResult(result), _operator))
+        append((self.FuncResult(result), _operator))
         return result
 
     def visit_UnaryOp(self, node):
+        append = self.nodes.append
         op = type(node.op)
-        func = self._unary_ops[op]
+        func = _unary_ops[op]
         operand = self.visit(node.operand)
-        if not isinstance(node.operand, self._simple):
-            self.nodes.append((operand, node.operand))
+        if not node.operand._is_simple:
+            append((operand, node.operand))
         result = func(operand)
-        self.nodes.append((self.FuncResult(result), node))
+        append((self.FuncResult(result), node))
         return result
 
     def visit_IfExp(self, node):
+        append = self.nodes.append
         body = self.visit(node.body)
-        if not isinstance(node.body, self._simple):
-            self.nodes.append((body, node.body))
+        if not node.body._is_simple:
+            append((body, node.body))
         test = self.visit(node.test)
-        if not isinstance(node.test, self._simple):
-            self.nodes.append((test, node.test))
+        if not node.test._is_simple:
+            append((test, node.test))
         orelse = self.visit(node.orelse)
-        if not isinstance(node.orelse, self._simple):
-            self.nodes.append((orelse, node.orelse))
+        if not node.orelse._is_simple:
+            append((orelse, node.orelse))
         result = body if test else orelse
-        self.nodes.append((self.FuncResult(result), node))
+        append((self.FuncResult(result), node))
         return result
 
     def visit_BoolOp(self, node):
+        append = self.nodes.append
         op = type(node.op)
-        operator = node.op
-        func = self._boolean_ops[op]
+        op_node = node.op
+        func = _boolean_ops[op]
 
         left = self.visit(node.values[0])
-        if not isinstance(node.values[0], self._simple):
-            self.nodes.append((left, node.values[0]))
+        if not node.values[0]._is_simple:
+            append((left, node.values[0]))
 
+        result = left
         for value in node.values[1:]:
+            # short-circuit the same way Python does
+            if (op is ast.And and not left) or (op is ast.Or and left):
+                break
             right = self.visit(value)
-            if not isinstance(value, self._simple):
-                self.nodes.append((right, value))
+            if not value._is_simple:
+                append((right, value))
             result = func(left, right)
-            _operator = copy.copy(operator)
-            _operator.lineno, _operator.col_offset = self._find_operator(
-                op, value.lineno, value.col_offset
+            _operator = self.OperatorNode(
+                op_node, *self._find_operator(op, value.lineno, value.col_offset)
             )
-            self.nodes.append((self.FuncResult(result), _operator))
+            append((self.FuncResult(result), _operator))
             left = result
         return result
 
     def visit_Tuple(self, node):
+        append = self.nodes.append
         result = []
         for e in node.elts:
             v = self.visit(e)
-            if not isinstance(e, self._simple):
-                self.nodes.append((v, e))
+            if not e._is_simple:
+                append((v, e))
             result.append(v)
         result = tuple(result)
-        self.nodes.append((self.FuncResult(result), node))
+        append((self.FuncResult(result), node))
         return result
 
     def visit_Set(self, node):
+        append = self.nodes.append
         result = []
         for e in node.elts:
             v = self.visit(e)
-            if not isinstance(e, self._simple):
-                self.nodes.append((v, e))
+            if not e._is_simple:
+                append((v, e))
             result.append(v)
         result = set(result)
-        self.nodes.append((self.FuncResult(result), node))
+        append((self.FuncResult(result), node))
         return result
 
     def visit_List(self, node):
+        append = self.nodes.append
         result = []
         for e in node.elts:
             v = self.visit(e)
-            if not isinstance(e, self._simple):
-                self.nodes.append((v, e))
+            if not e._is_simple:
+                append((v, e))
             result.append(v)
-        self.nodes.append((self.FuncResult(result), node))
+        append((self.FuncResult(result), node))
         return result
 
     def visit_Dict(self, node):
+        append = self.nodes.append
         keys = []
         for k in node.keys:
             v = self.visit(k)
-            if not isinstance(k, self._simple):
-                self.nodes.append((v, k))
+            if not k._is_simple:
+                append((v, k))
             keys.append(v)
         values = []
         for value in node.values:
             v = self.visit(value)
-            if not isinstance(value, self._simple):
-                self.nodes.append((v, value))
+            if not value._is_simple:
+                append((v, value))
             values.append(v)
         result = dict(zip(keys, values))
-        self.nodes.append((self.FuncResult(result), node))
+        append((self.FuncResult(result), node))
         return result
 
+    def visit_Name(self, node):
+        try:
+            return self._scope[node.id]
+        except KeyError:
+            raise NameError("name '%s' is not defined" % node.id) from None
+
+    def visit_Constant(self, node):
+        return node.value
+
     def generic_visit(self, node):
         # some expressions like comprehensions will have their
         # own local scope so therefore we combine globals and locals
@@ -491,39 +767,14 @@ class AssertEval(ast.NodeVisitor):
         f_globals = self.f_globals.copy()
         f_globals.update(self.f_locals)
         if isinstance(node, ast.expr):
-            bytecode = compile(ast.Expression(node), "assertion node", "eval")
-            return eval(bytecode, f_globals)
+            return eval(_compile_expression(node), f_globals)
         elif isinstance(node, ast.stmt):
             bytecode = compile(ast.Module([node]), "assertion node", "exec")
             return exec(bytecode, f_globals)
         return super(AssertEval, self).generic_visit(node)
 
 
-def _code_block(filename, lineno, before=8, after=4):
-    """Retrieve code blocks around a given line
-    inside the source.
-
-    :param filename: name of the source file
-    :param lineno: line number
-    :param before: number of lines before the line number
-    :param after: number of line after the line number
-    """
-    min_n = max(lineno - before, 0)
-    max_n = lineno + after
-
-    line_fmt = "%" + str(len(str(max_n))) + "d|  %s"
-    lines = []
-
-    for n in range(min_n, max_n):
-        line = linecache.getline(filename, n)
-        if n > min_n and len(line) == 0:
-            break
-        print_line = line_fmt % (n, line)
-        if n == lineno:
-            print_line = "|> ".join(print_line.split("|  ", 1))
-        lines.append(print_line)
-
-    return lines
+AssertEval._visitors = _visitor_table(AssertEval)
 
 
 class error(object):
@@ -545,6 +796,19 @@ class error(object):
         that shows source code where assert expression is found, default: `True`
     """
 
+    __slots__ = (
+        "frame",
+        "frame_info",
+        "desc",
+        "nodes",
+        "expression",
+        "expression_section",
+        "description_section",
+        "values_section",
+        "where_section",
+        "message",
+    )
+
     def __init__(
         self,
         desc=None,
@@ -559,10 +823,10 @@ class error(object):
     ):
         self.frame = frame
         if self.frame is None:
-            self.frame = inspect.currentframe().f_back
+            self.frame = sys._getframe(1)
         self.frame_info = frame_info
         if self.frame_info is None:
-            self.frame_info = inspect.getframeinfo(self.frame)
+            self.frame_info = _frame_info(self.frame)
         self.desc = str(desc) if desc is not None else None
         self.nodes = list(nodes) if nodes is not None else None
         self.expression = str(expression) if expression is not None else None
@@ -579,57 +843,64 @@ class error(object):
         """Re-evaluate assertion statement and
         generate an error message.
         """
-        if self.nodes is None:
+        # only the expression and values sections need the assertion re-evaluated
+        if self.nodes is None and (self.expression_section or self.values_section):
             self.expression, self.nodes = AssertEval(self.frame, self.frame_info).eval()
         return self.generate_message()
 
     def generate_expression_section(self):
         """Return expression section."""
-        section = ""
+        parts = []
         if self.expression_section and self.expression:
-            section += "\n\nThe following assertion was not satisfied"
-            for line in self.expression:
-                section += "\n  " + line
-        return section
+            parts.append("\n\nThe following assertion was not satisfied")
+            parts.extend("\n  " + line for line in self.expression)
+        return "".join(parts)
 
     def generate_description_section(self):
         """Return description section."""
-        section = ""
+        parts = []
         if self.description_section and self.desc:
-            section += "\n\nDescription"
-            section += "\n  " + self.desc[0].capitalize() + self.desc[1:]
-        return section
+            parts.append("\n\nDescription")
+            parts.append("\n  " + self.desc[0].capitalize() + self.desc[1:])
+        return "".join(parts)
 
     def generate_values_section(self):
         """Return values section."""
-        section = ""
+        parts = []
         if self.values_section and self.nodes:
-            section += "\n\nAssertion values"
+            parts.append("\n\nAssertion values")
+            lines = ["\n  " + line for line in self.expression]
             for v, n in self.nodes:
-                for i, line in enumerate(self.expression):
-                    section += "\n  " + line
-                    if n.lineno == i + 1:
-                        col_offset = n.col_offset
-                        if col_offset < 0:
-                            col_offset = len(line) - len(line.lstrip())
-                        section += "\n  " + " " * col_offset + "^ is " + _saferepr(v)
-        return section
+                if not 0 < n.lineno <= len(lines):
+                    parts.extend(lines)
+                    continue
+                line = self.expression[n.lineno - 1]
+                col_offset = n.col_offset
+                if col_offset < 0:
+                    col_offset = len(line) - len(line.lstrip())
+                parts.extend(lines[: n.lineno])
+                parts.append("\n  " + " " * col_offset + "^ is " + _saferepr(v))
+                parts.extend(lines[n.lineno :])
+        return "".join(parts)
 
     def generate_where_section(self):
         """Return where section."""
-        section = ""
+        parts = []
         if self.where_section and self.frame_info.code_context:
-            section += "\n\nWhere"
-            section += "\n  File '%s', line %d in '%s'" % (
-                self.frame_info.filename,
-                self.frame_info.lineno,
-                self.frame_info.function,
+            parts.append("\n\nWhere")
+            parts.append(
+                "\n  File '%s', line %d in '%s'"
+                % (
+                    self.frame_info.filename,
+                    self.frame_info.lineno,
+                    self.frame_info.function,
+                )
             )
-
-            section += "\n\n" + "".join(
+            parts.append("\n\n")
+            parts.extend(
                 self.code_block(self.frame_info.filename, self.frame_info.lineno)
             )
-        return section
+        return "".join(parts)
 
     def generate_message(self):
         """Generate an error message.
@@ -637,12 +908,15 @@ class error(object):
         :param expression: expression
         :param frame_info: frame info
         """
-        message = "Oops! Assertion failed"
-        message += self.generate_expression_section()
-        message += self.generate_description_section()
-        message += self.generate_values_section()
-        message += self.generate_where_section()
-        return message
+        return "".join(
+            [
+                "Oops! Assertion failed",
+                self.generate_expression_section(),
+                self.generate_description_section(),
+                self.generate_values_section(),
+                self.generate_where_section(),
+            ]
+        )
 
     def code_block(self, filename, lineno, before=8, after=4):
         """Retrieve code blocks around a given line
@@ -653,16 +927,17 @@ class error(object):
         :param before: number of lines before the line number
         :param after: number of line after the line number
         """
+        sourcelines = linecache.getlines(filename)
         min_n = max(lineno - before, 1)
         max_n = lineno + after
 
         line_fmt = "%" + str(len(str(max_n))) + "d|  %s"
         lines = []
 
-        for n in range(min_n, max_n):
-            line = linecache.getline(filename, n)
-            if n > min_n and len(line) == 0:
-                break
+        # an empty first line is still shown when the block is past the end
+        block = sourcelines[min_n - 1 : max_n - 1] or [""]
+
+        for n, line in enumerate(block, min_n):
             print_line = line_fmt % (n, line)
             if n == lineno:
                 print_line = "|> ".join(print_line.split("|  ", 1))
@@ -676,6 +951,14 @@ class errors(object):
     to wrap multiple assert statements.
     """
 
+    __slots__ = (
+        "errors",
+        "expression_section",
+        "description_section",
+        "values_section",
+        "where_section",
+    )
+
     class softerror(object):
         """Context manager that is used
         to wrap soft assertion.
@@ -683,6 +966,8 @@ class errors(object):
         :param errors: list to which an exception will be added
         """
 
+        __slots__ = ("errors",)
+
         def __init__(self, errors):
             self.errors = errors
 
@@ -691,8 +976,8 @@ class errors(object):
 
         def __exit__(self, exc_type, exc_val, exc_tb):
             if isinstance(exc_val, AssertionError):
-                frame = inspect.currentframe().f_back
-                frame_info = inspect.getinnerframes(exc_tb)[-1]
+                # the assertion is evaluated in the frame where it has failed
+                frame, frame_info = _failed_frame(exc_tb)
                 desc = None
                 if exc_val.args:
                     if isinstance(exc_val.args[0], error):
@@ -731,8 +1016,8 @@ class errors(object):
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         if isinstance(exc_val, AssertionError):
-            frame = inspect.currentframe().f_back
-            frame_info = inspect.getinnerframes(exc_tb)[-1]
+            # the assertion is evaluated in the frame where it has failed
+            frame, frame_info = _failed_frame(exc_tb)
             desc = None
             if exc_val.args:
                 if isinstance(exc_val.args[0], error):
@@ -756,7 +1041,10 @@ class errors(object):
 
 def _saferepr(value):
     try:
-        r = textwrap.indent(repr(value), " " * 2)
+        r = repr(value)
+        # single line representations need no indentation
+        if _line_breaks.search(r):
+            r = textwrap.indent(r, " " * 2)
         return r.lstrip()
     except Exception as e:
         return "<unknown> (repr() failed with '%s')" % str(e)
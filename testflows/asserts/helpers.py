@@ -12,9 +12,10 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
-import inspect
+import sys
 
 from testflows.asserts import error
+from testflows.asserts.asserts import _frame_info
 from testflows.snapshots.snapshots import *
 
 __all__ = ["raises", "snapshot"]
@@ -28,8 +29,14 @@ class raises(object):
     def __init__(self, *excs):
         self.excs = excs
         self.exception = None
-        self.frame = inspect.currentframe().f_back
-        self.frame_info = inspect.getframeinfo(self.frame)
+        self.frame = sys._getframe(1)
+        # frame info is only needed if the assertion fails
+        self.lineno = self.frame.f_lineno
+
+    @property
+    def frame_info(self):
+        """Frame info of the caller's frame."""
+        return _frame_info(self.frame, self.lineno)
 
     def __enter__(self):
         return self
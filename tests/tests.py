@@ -12,10 +12,7 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
-import sys
-import re
-import random
-import tempfile
+import io
 
 from testflows.core import main, note
 from testflows.core import TestModule, Module, Test, Suite, xfail
@@ -39,6 +36,17 @@ def snap(value):
     return repr(value)
 
 
+def check_snapshot(value, id, mode):
+    """Check that the value matches its snapshot.
+
+    :param value: value
+    :param id: snapshot id
+    :param mode: snapshot mode
+    """
+    with values() as that:
+        assert that(snapshot(value, id, encoder=snap, mode=mode)), error()
+
+
 @TestModule
 def regression(self, mode=snapshot.CHECK):
     """TestFlows - Asserts regression suite."""
@@ -54,10 +62,18 @@ def regression(self, mode=snapshot.CHECK):
                     assert True
                     assert False, "boo"
             note(e.exception)
-            with values() as that:
-                assert that(
-                    snapshot(e.exception, "errors-errors", encoder=snap, mode=mode)
-                ), error()
+            check_snapshot(e.exception, "errors-errors", mode=mode)
+
+        with Test("errors in a function"):
+
+            def check(x):
+                assert x == 2
+
+            with raises(AssertionError) as e:
+                with errors():
+                    check(1)
+            note(e.exception)
+            check_snapshot(e.exception, "errors-errors-in-function", mode=mode)
 
         with Test("soft error no fails"):
             with errors() as soft:
@@ -75,10 +91,19 @@ def regression(self, mode=snapshot.CHECK):
                         assert False, "boo2"
                     assert True
             note(e.exception)
-            with values() as that:
-                assert that(
-                    snapshot(e.exception, "errors-soft-errors", encoder=snap, mode=mode)
-                ), error()
+            check_snapshot(e.exception, "errors-soft-errors", mode=mode)
+
+        with Test("soft error in a function"):
+
+            def check(x):
+                assert x == 2
+
+            with raises(AssertionError) as e:
+                with errors() as soft:
+                    with soft.error():
+                        check(1)
+            note(e.exception)
+            check_snapshot(e.exception, "errors-soft-error-in-function", mode=mode)
 
         with Test("mixed errors no fails"):
             with errors() as soft:
@@ -100,25 +125,14 @@ def regression(self, mode=snapshot.CHECK):
                     # should cause an exception
                     assert 1 / 0
             note(e.exception)
-            with values() as that:
-                assert that(
-                    snapshot(
-                        e.exception, "errors-mixed-errors", encoder=snap, mode=mode
-                    )
-                ), error()
+            check_snapshot(e.exception, "errors-mixed-errors", mode=mode)
 
     with Suite("helpers"):
         with Test("snapshot"):
             with Test("triple quotes"):
-                with values() as that:
-                    assert that(
-                        snapshot(
-                            '"""hello"""there"""""foo""boo',
-                            "snapshot-triple-quotes",
-                            encoder=snap,
-                            mode=mode,
-                        )
-                    ), error()
+                check_snapshot(
+                    '"""hello"""there"""""foo""boo', "snapshot-triple-quotes", mode=mode
+                )
 
             with Test("multiple snapshots in the same file"):
                 with values() as that:
@@ -160,33 +174,20 @@ def regression(self, mode=snapshot.CHECK):
                     with raises(AssertionError):
                         pass
                 note(e.exception)
-                with values() as that:
-                    assert that(
-                        snapshot(
-                            e.exception, "raises-not-raised", encoder=snap, mode=mode
-                        )
-                    ), error()
+                check_snapshot(e.exception, "raises-not-raised", mode=mode)
 
             with Test("unexpected exception"):
                 with raises(AssertionError) as e:
                     with raises(AssertionError):
                         raise ValueError("error")
                 note(e.exception)
-                with values() as that:
-                    assert that(
-                        snapshot(
-                            e.exception, "raises-unexpected-exception", encoder=snap
-                        )
-                    ), error()
+                check_snapshot(e.exception, "raises-unexpected-exception", mode=mode)
 
             with Test("ok"):
                 with raises(ValueError) as e:
                     raise ValueError("error")
                 note(e.exception)
-                with values() as that:
-                    assert that(
-                        snapshot(e.exception, "raised-ok", encoder=snap, mode=mode)
-                    ), error()
+                check_snapshot(e.exception, "raised-ok", mode=mode)
 
     with Suite("assertions"):
         with Test("multiline"):
@@ -194,12 +195,7 @@ def regression(self, mode=snapshot.CHECK):
                 with raises(AssertionError) as e:
                     assert (1, 2) is False, error()
                 note(e.exception)
-                with values() as that:
-                    assert that(
-                        snapshot(
-                            e.exception, "multiline-implicit", encoder=snap, mode=mode
-                        )
-                    ), error()
+                check_snapshot(e.exception, "multiline-implicit", mode=mode)
 
             with Test("explicit"):
                 with raises(AssertionError) as e:
@@ -212,30 +208,25 @@ def regression(self, mode=snapshot.CHECK):
                         or 4 > +4
                     ), error()
                 note(e.exception)
-                with values() as that:
-                    assert that(
-                        snapshot(
-                            e.exception, "multiline-explicit", encoder=snap, mode=mode
-                        )
-                    ), error()
+                check_snapshot(e.exception, "multiline-explicit", mode=mode)
+
+            with Test("error call"):
+                with raises(AssertionError) as e:
+                    assert 1 == 2, error(
+                        "description",
+                    )
+                note(e.exception)
+                check_snapshot(e.exception, "multiline-error_call", mode=mode)
 
         with Test("values"):
             with Test("assert with file read"):
-                with tempfile.TemporaryFile("w+") as fp:
-                    fp.write("hello")
-                    fp.seek(0)
+                with io.StringIO("hello") as fp:
                     with raises(AssertionError) as e, values() as that:
                         assert not that(fp.read()), error()
                     note(e.exception)
-                    with values() as that:
-                        assert that(
-                            snapshot(
-                                e.exception,
-                                "values-assert_with_file_read",
-                                encoder=snap,
-                                mode=mode,
-                            )
-                        ), error()
+                    check_snapshot(
+                        e.exception, "values-assert_with_file_read", mode=mode
+                    )
 
             with Test("assert with list append"):
                 some_list = []
@@ -244,15 +235,7 @@ def regression(self, mode=snapshot.CHECK):
                 note(e.exception)
                 with Test("assert that list did not change"):
                     assert some_list == [2], error()
-                with values() as that:
-                    assert that(
-                        snapshot(
-                            e.exception,
-                            "values-assert_with_list_append",
-                            encoder=snap,
-                            mode=mode,
-                        )
-                    ), error()
+                check_snapshot(e.exception, "values-assert_with_list_append", mode=mode)
 
         with Suite("func"):
             with Test("args"):
@@ -268,10 +251,7 @@ def regression(self, mode=snapshot.CHECK):
                 with Test("assert that args are the same"):
                     assert vs[0] == vs[1], error()
                 with Test("assert exception snapshot value"):
-                    with values() as that:
-                        assert that(
-                            snapshot(e.exception, "func-args", encoder=snap, mode=mode)
-                        ), error()
+                    check_snapshot(e.exception, "func-args", mode=mode)
 
             with Test("*vargs"):
                 vs = []
@@ -286,10 +266,7 @@ def regression(self, mode=snapshot.CHECK):
                 note(e.exception)
                 with Test("assert *vargs are the same"):
                     assert vs[0] == vs[1]
-                with values() as that:
-                    assert that(
-                        snapshot(e.exception, "func-vargs", encoder=snap, mode=mode)
-                    ), error()
+                check_snapshot(e.exception, "func-vargs", mode=mode)
 
             with Test("**kwargs"):
                 vs = []
@@ -304,10 +281,7 @@ def regression(self, mode=snapshot.CHECK):
                 note(e.exception)
                 with Test("assert **kwargs are the same"):
                     assert vs[0] == vs[1]
-                with values() as that:
-                    assert that(
-                        snapshot(e.exception, "func-kwargs", encoder=snap, mode=mode)
-                    ), error()
+                check_snapshot(e.exception, "func-kwargs", mode=mode)
 
             with Test("args *vargs **kwargs"):
                 vs = []
@@ -322,185 +296,118 @@ def regression(self, mode=snapshot.CHECK):
                 note(e.exception)
                 with Test("assert args, *vargs, **kwargs are the same"):
                     assert vs[0] == vs[1]
-                with values() as that:
-                    assert that(
-                        snapshot(
-                            e.exception,
-                            "func-args_vargs_kwargs",
-                            encoder=snap,
-                            mode=mode,
-                        )
-                    ), error()
+                check_snapshot(e.exception, "func-args_vargs_kwargs", mode=mode)
 
         with Suite("boolean ops"):
             with Test("and"):
                 with raises(AssertionError) as e:
                     assert 1 and 0, error()
                 note(e.exception)
-                with values() as that:
-                    assert that(
-                        snapshot(
-                            e.exception, "boolean-ops-and", encoder=snap, mode=mode
-                        )
-                    ), error()
+                check_snapshot(e.exception, "boolean-ops-and", mode=mode)
 
             with Test("multiple and"):
                 with raises(AssertionError) as e:
                     assert 1 and 2 and 3 and 0, error()
                 note(e.exception)
-                with values() as that:
-                    assert that(
-                        snapshot(
-                            e.exception,
-                            "boolean-ops-multiple-and",
-                            encoder=snap,
-                            mode=mode,
-                        )
-                    ), error()
+                check_snapshot(e.exception, "boolean-ops-multiple-and", mode=mode)
 
             with Test("or"):
                 with raises(AssertionError) as e:
                     assert 0 or "", error()
                 note(e.exception)
-                with values() as that:
-                    assert that(
-                        snapshot(e.exception, "boolean-ops-or", encoder=snap, mode=mode)
-                    ), error()
+                check_snapshot(e.exception, "boolean-ops-or", mode=mode)
 
             with Test("multiple or"):
                 with raises(AssertionError) as e:
                     assert 0 or "" or False or None, error()
                 note(e.exception)
-                with values() as that:
-                    assert that(
-                        snapshot(
-                            e.exception,
-                            "boolean-ops-multiple-or",
-                            encoder=snap,
-                            mode=mode,
-                        )
-                    ), error()
+                check_snapshot(e.exception, "boolean-ops-multiple-or", mode=mode)
+
+            with Test("short circuit"):
+                vs = []
+
+                def foo(x):
+                    vs.append(x)
+                    return x
+
+                with raises(AssertionError) as e:
+                    assert foo(0) and foo(1) or foo("") and foo(2), error()
+                note(e.exception)
+                with Test("assert short circuited values were not evaluated"):
+                    assert vs == [0, "", 0, ""], error()
 
         with Suite("binary ops"):
             with Test("add"):
                 with raises(AssertionError) as e:
                     assert 1 + 3 is False, error()
                 note(e.exception)
-                with values() as that:
-                    assert that(
-                        snapshot(e.exception, "binary-ops-add", encoder=snap, mode=mode)
-                    ), error()
+                check_snapshot(e.exception, "binary-ops-add", mode=mode)
 
             with Test("sub"):
                 with raises(AssertionError) as e:
                     assert 1 - 3 is False, error()
                 note(e.exception)
-                with values() as that:
-                    assert that(
-                        snapshot(e.exception, "binary-ops-sub", encoder=snap, mode=mode)
-                    ), error()
+                check_snapshot(e.exception, "binary-ops-sub", mode=mode)
 
             with Test("mul"):
                 with raises(AssertionError) as e:
                     assert 1 * 3 is False, error()
                 note(e.exception)
-                with values() as that:
-                    assert that(
-                        snapshot(e.exception, "binary-ops-mul", encoder=snap, mode=mode)
-                    ), error()
+                check_snapshot(e.exception, "binary-ops-mul", mode=mode)
 
             with Test("div"):
                 with raises(AssertionError) as e:
                     assert 1 / 3 is False, error()
                 note(e.exception)
-                with values() as that:
-                    assert that(
-                        snapshot(e.exception, "binary-ops-div", encoder=snap, mode=mode)
-                    ), error()
+                check_snapshot(e.exception, "binary-ops-div", mode=mode)
 
             with Test("mod"):
                 with raises(AssertionError) as e:
                     assert 1 % 3 is False, error()
                 note(e.exception)
-                with values() as that:
-                    assert that(
-                        snapshot(e.exception, "binary-ops-mod", encoder=snap, mode=mode)
-                    ), error()
+                check_snapshot(e.exception, "binary-ops-mod", mode=mode)
 
             with Test("pow"):
                 with raises(AssertionError) as e:
                     assert 1**3 is False, error()
                 note(e.exception)
-                with values() as that:
-                    assert that(
-                        snapshot(e.exception, "binary-ops-pow", encoder=snap, mode=mode)
-                    ), error()
+                check_snapshot(e.exception, "binary-ops-pow", mode=mode)
 
             with Test("lshift"):
                 with raises(AssertionError) as e:
                     assert 1 << 3 is False, error()
                 note(e.exception)
-                with values() as that:
-                    assert that(
-                        snapshot(
-                            e.exception, "binary-ops-lshift", encoder=snap, mode=mode
-                        )
-                    ), error()
+                check_snapshot(e.exception, "binary-ops-lshift", mode=mode)
 
             with Test("rshift"):
                 with raises(AssertionError) as e:
                     assert 1 >> 3 is False, error()
                 note(e.exception)
-                with values() as that:
-                    assert that(
-                        snapshot(
-                            e.exception, "binary-ops-rshift", encoder=snap, mode=mode
-                        )
-                    ), error()
+                check_snapshot(e.exception, "binary-ops-rshift", mode=mode)
 
             with Test("bitOr"):
                 with raises(AssertionError) as e:
                     assert 1 | 3 is False, error()
                 note(e.exception)
-                with values() as that:
-                    assert that(
-                        snapshot(
-                            e.exception, "binary-ops-bitOr", encoder=snap, mode=mode
-                        )
-                    ), error()
+                check_snapshot(e.exception, "binary-ops-bitOr", mode=mode)
 
             with Test("bitXor"):
                 with raises(AssertionError) as e:
                     assert 1 ^ 3 is False, error()
                 note(e.exception)
-                with values() as that:
-                    assert that(
-                        snapshot(
-                            e.exception, "binary-ops-bitXor", encoder=snap, mode=mode
-                        )
-                    ), error()
+                check_snapshot(e.exception, "binary-ops-bitXor", mode=mode)
 
             with Test("bitAnd"):
                 with raises(AssertionError) as e:
                     assert 1 & 3 is False, error()
                 note(e.exception)
-                with values() as that:
-                    assert that(
-                        snapshot(
-                            e.exception, "binary-ops-bitAnd", encoder=snap, mode=mode
-                        )
-                    ), error()
+                check_snapshot(e.exception, "binary-ops-bitAnd", mode=mode)
 
             with Test("floor div"):
                 with raises(AssertionError) as e:
                     assert 1 // 3 is False, error()
                 note(e.exception)
-                with values() as that:
-                    assert that(
-                        snapshot(
-                            e.exception, "binary-ops-floor-div", encoder=snap, mode=mode
-                        )
-                    ), error()
+                check_snapshot(e.exception, "binary-ops-floor-div", mode=mode)
 
             with Test("mixed ops"):
                 with raises(AssertionError) as e:
@@ -508,260 +415,154 @@ def regression(self, mode=snapshot.CHECK):
                         1 + 3 - 4 * 5**1 >> 1 << 3 % 5 | 2 ^ 5 & 6 // 3 is False
                     ), error()
                 note(e.exception)
-                with values() as that:
-                    assert that(
-                        snapshot(
-                            e.exception, "binary-ops-mixed-ops", encoder=snap, mode=mode
-                        )
-                    ), error()
+                check_snapshot(e.exception, "binary-ops-mixed-ops", mode=mode)
 
         with Suite("unary ops"):
             with Test("invert"):
                 with raises(AssertionError) as e:
                     assert ~4 is False, error()
                 note(e.exception)
-                with values() as that:
-                    assert that(
-                        snapshot(
-                            e.exception, "unary-ops-invert", encoder=snap, mode=mode
-                        )
-                    ), error()
+                check_snapshot(e.exception, "unary-ops-invert", mode=mode)
 
             with Test("not"):
                 with raises(AssertionError) as e:
                     assert not 4 is 4, error()
                 note(e.exception)
-                with values() as that:
-                    assert that(
-                        snapshot(e.exception, "unary-ops-not", encoder=snap, mode=mode)
-                    ), error()
+                check_snapshot(e.exception, "unary-ops-not", mode=mode)
 
             with Test("uadd"):
                 with raises(AssertionError) as e:
                     assert +4 is False, error()
                 note(e.exception)
-                with values() as that:
-                    assert that(
-                        snapshot(e.exception, "unary-ops-uadd", encoder=snap, mode=mode)
-                    ), error()
+                check_snapshot(e.exception, "unary-ops-uadd", mode=mode)
 
             with Test("usub"):
                 with raises(AssertionError) as e:
                     assert -4 is False, error()
                 note(e.exception)
-                with values() as that:
-                    assert that(
-                        snapshot(e.exception, "unary-ops-usub", encoder=snap, mode=mode)
-                    ), error()
+                check_snapshot(e.exception, "unary-ops-usub", mode=mode)
 
         with Suite("compare ops"):
             with Test("eq"):
                 with raises(AssertionError) as e:
                     assert 1 == 2, error()
                 note(e.exception)
-                with values() as that:
-                    assert that(
-                        snapshot(e.exception, "compare-ops-eq", encoder=snap, mode=mode)
-                    ), error()
+                check_snapshot(e.exception, "compare-ops-eq", mode=mode)
 
             with Test("eq str"):
                 with raises(AssertionError) as e:
                     assert "1:a\n2:a\n3:c" == "1:a\n2:b\n3:c", error()
                 note(e.exception)
-                with values() as that:
-                    assert that(
-                        snapshot(
-                            e.exception, "compare-ops-eq-str", encoder=snap, mode=mode
-                        )
-                    ), error()
+                check_snapshot(e.exception, "compare-ops-eq-str", mode=mode)
 
             with Test("eq tuple"):
                 with raises(AssertionError) as e:
                     assert (1, 2, 3) == (1, 1, 3), error()
                 note(e.exception)
-                with values() as that:
-                    assert that(
-                        snapshot(
-                            e.exception, "compare-ops-eq-tuple", encoder=snap, mode=mode
-                        )
-                    ), error()
+                check_snapshot(e.exception, "compare-ops-eq-tuple", mode=mode)
 
             with Test("eq list"):
                 with raises(AssertionError) as e:
                     assert [1, 2, 3] == [1, 1, 3], error()
                 note(e.exception)
-                with values() as that:
-                    assert that(
-                        snapshot(
-                            e.exception, "compare-ops-eq-list", encoder=snap, mode=mode
-                        )
-                    ), error()
+                check_snapshot(e.exception, "compare-ops-eq-list", mode=mode)
 
             with Test("eq set"):
                 with raises(AssertionError) as e:
                     assert {1, 2, 3} == {1, 2, 3, 4}, error()
                 note(e.exception)
-                with values() as that:
-                    assert that(
-                        snapshot(
-                            e.exception, "compare-ops-eq-set", encoder=snap, mode=mode
-                        )
-                    ), error()
+                check_snapshot(e.exception, "compare-ops-eq-set", mode=mode)
 
             with Test("eq dict"):
                 with raises(AssertionError) as e:
                     assert {1: "a", 2: "a", 3: "c"} == {1: "a", 2: "b", 3: "c"}, error()
                 note(e.exception)
-                with values() as that:
-                    assert that(
-                        snapshot(
-                            e.exception, "compare-ops-eq-dict", encoder=snap, mode=mode
-                        )
-                    ), error()
+                check_snapshot(e.exception, "compare-ops-eq-dict", mode=mode)
 
             with Test("ne"):
                 with raises(AssertionError) as e:
                     assert 1 != 1, error()
                 note(e.exception)
-                with values() as that:
-                    assert that(
-                        snapshot(e.exception, "compare-ops-ne", encoder=snap, mode=mode)
-                    ), error()
+                check_snapshot(e.exception, "compare-ops-ne", mode=mode)
 
             with Test("lt"):
                 with raises(AssertionError) as e:
                     assert 1 < 1, error()
                 note(e.exception)
-                with values() as that:
-                    assert that(
-                        snapshot(e.exception, "compare-ops-lt", encoder=snap, mode=mode)
-                    ), error()
+                check_snapshot(e.exception, "compare-ops-lt", mode=mode)
 
             with Test("le"):
                 with raises(AssertionError) as e:
                     assert 1 <= 0, error()
                 note(e.exception)
-                with values() as that:
-                    assert that(
-                        snapshot(e.exception, "compare-ops-le", encoder=snap, mode=mode)
-                    ), error()
+                check_snapshot(e.exception, "compare-ops-le", mode=mode)
 
             with Test("gt"):
                 with raises(AssertionError) as e:
                     assert 1 > 1, error()
                 note(e.exception)
-                with values() as that:
-                    assert that(
-                        snapshot(e.exception, "compare-ops-gt", encoder=snap, mode=mode)
-                    ), error()
+                check_snapshot(e.exception, "compare-ops-gt", mode=mode)
 
             with Test("ge"):
                 with raises(AssertionError) as e:
                     assert 1 >= 2, error()
                 note(e.exception)
-                with values() as that:
-                    assert that(
-                        snapshot(e.exception, "compare-ops-ge", encoder=snap, mode=mode)
-                    ), error()
+                check_snapshot(e.exception, "compare-ops-ge", mode=mode)
 
             with Test("is"):
                 with raises(AssertionError) as e:
                     assert 1 is 2, error()
                 note(e.exception)
-                with values() as that:
-                    assert that(
-                        snapshot(e.exception, "compare-ops-is", encoder=snap, mode=mode)
-                    ), error()
+                check_snapshot(e.exception, "compare-ops-is", mode=mode)
 
             with Test("is not"):
                 with raises(AssertionError) as e:
                     assert 1 is not 1, error()
                 note(e.exception)
-                with values() as that:
-                    assert that(
-                        snapshot(
-                            e.exception, "compare-ops-is-not", encoder=snap, mode=mode
-                        )
-                    ), error()
+                check_snapshot(e.exception, "compare-ops-is-not", mode=mode)
 
             with Test("in"):
                 with raises(AssertionError) as e:
                     assert 1 in [2], error()
                 note(e.exception)
-                with values() as that:
-                    assert that(
-                        snapshot(e.exception, "compare-ops-in", encoder=snap, mode=mode)
-                    ), error()
+                check_snapshot(e.exception, "compare-ops-in", mode=mode)
 
             with Test("not in"):
                 with raises(AssertionError) as e:
                     assert 1 not in [1], error()
                 note(e.exception)
-                with values() as that:
-                    assert that(
-                        snapshot(
-                            e.exception, "compare-ops-not-in", encoder=snap, mode=mode
-                        )
-                    ), error()
+                check_snapshot(e.exception, "compare-ops-not-in", mode=mode)
 
         with Suite("common types"):
             with Test("str"):
                 with raises(AssertionError) as e:
                     assert "hello" is False, error()
                 note(e.exception)
-                with values() as that:
-                    assert that(
-                        snapshot(
-                            e.exception, "common-types-str", encoder=snap, mode=mode
-                        )
-                    ), error()
+                check_snapshot(e.exception, "common-types-str", mode=mode)
 
             with Test("list"):
                 with raises(AssertionError) as e:
                     assert [1] is False, error()
                 note(e.exception)
-                with values() as that:
-                    assert that(
-                        snapshot(
-                            e.exception, "common-types-list", encoder=snap, mode=mode
-                        )
-                    ), error()
+                check_snapshot(e.exception, "common-types-list", mode=mode)
 
             with Test("tuple"):
                 with raises(AssertionError) as e:
                     assert (1,) is False, error()
                 note(e.exception)
-                with values() as that:
-                    assert that(
-                        snapshot(
-                            e.exception, "common-types-tuple", encoder=snap, mode=mode
-                        )
-                    ), error()
+                check_snapshot(e.exception, "common-types-tuple", mode=mode)
 
             with Test("dict"):
                 with raises(AssertionError) as e:
                     assert {"a": 1} is False, error()
                 note(e.exception)
-                with values() as that:
-                    assert that(
-                        snapshot(
-                            e.exception, "common-types-dict", encoder=snap, mode=mode
-                        )
-                    ), error()
+                check_snapshot(e.exception, "common-types-dict", mode=mode)
 
             with Test("object type"):
                 with raises(AssertionError) as e:
                     assert object is False, error()
                 note(e.exception)
-                with values() as that:
-                    assert that(
-                        snapshot(
-                            e.exception,
-                            "common-types-object-type",
-                            encoder=snap,
-                            mode=mode,
-                        )
-                    ), error()
+                check_snapshot(e.exception, "common-types-object-type", mode=mode)
 
             with Test("object"):
                 with raises(AssertionError) as e:
@@ -772,52 +573,26 @@ def regression(self, mode=snapshot.CHECK):
                 with raises(AssertionError) as e:
                     assert b"hello" is False, error()
                 note(e.exception)
-                with values() as that:
-                    assert that(
-                        snapshot(
-                            e.exception, "common-types-bytes", encoder=snap, mode=mode
-                        )
-                    ), error()
+                check_snapshot(e.exception, "common-types-bytes", mode=mode)
 
             with Test("unicode"):
                 with raises(AssertionError) as e:
                     assert "hello" is False, error()
                 note(e.exception)
-                with values() as that:
-                    assert that(
-                        snapshot(
-                            e.exception, "common-types-unicode", encoder=snap, mode=mode
-                        )
-                    ), error()
+                check_snapshot(e.exception, "common-types-unicode", mode=mode)
 
         with Suite("common idioms"):
             with Test("if/else"):
                 with raises(AssertionError) as e:
                     assert (1 if 1 else 2) is False, error()
                 note(e.exception)
-                with values() as that:
-                    assert that(
-                        snapshot(
-                            e.exception,
-                            "common-idioms-if-else",
-                            encoder=snap,
-                            mode=mode,
-                        )
-                    ), error()
+                check_snapshot(e.exception, "common-idioms-if-else", mode=mode)
 
             with Test("ellipsis"):
                 with raises(AssertionError) as e:
                     assert ... is False, error()
                 note(e.exception)
-                with values() as that:
-                    assert that(
-                        snapshot(
-                            e.exception,
-                            "common-idioms-ellipsis",
-                            encoder=snap,
-                            mode=mode,
-                        )
-                    ), error()
+                check_snapshot(e.exception, "common-idioms-ellipsis", mode=mode)
 
             with Test("assignment"):
 
@@ -827,29 +602,13 @@ def regression(self, mode=snapshot.CHECK):
                 with raises(AssertionError) as e:
                     assert foo(x=1) is False, error()
                 note(e.exception)
-                with values() as that:
-                    assert that(
-                        snapshot(
-                            e.exception,
-                            "common-idioms-assignment",
-                            encoder=snap,
-                            mode=mode,
-                        )
-                    ), error()
+                check_snapshot(e.exception, "common-idioms-assignment", mode=mode)
 
             with Test("subscript"):
                 with raises(AssertionError) as e:
                     assert [1, 2, 3][1:] is False, error()
                 note(e.exception)
-                with values() as that:
-                    assert that(
-                        snapshot(
-                            e.exception,
-                            "common-idioms-subscript",
-                            encoder=snap,
-                            mode=mode,
-                        )
-                    ), error()
+                check_snapshot(e.exception, "common-idioms-subscript", mode=mode)
 
             with Test("attr access"):
                 with raises(AssertionError) as e:
@@ -865,43 +624,19 @@ def regression(self, mode=snapshot.CHECK):
                 with raises(AssertionError) as e:
                     assert (lambda x: x)(1) is False, error()
                 note(e.exception)
-                with values() as that:
-                    assert that(
-                        snapshot(
-                            e.exception,
-                            "common-idioms-lambda-name",
-                            encoder=snap,
-                            mode=mode,
-                        )
-                    ), error()
+                check_snapshot(e.exception, "common-idioms-lambda-name", mode=mode)
 
             with Test("lambda expr"):
                 with raises(AssertionError) as e:
                     assert (lambda x: x + 1)(1) is False, error()
                 note(e.exception)
-                with values() as that:
-                    assert that(
-                        snapshot(
-                            e.exception,
-                            "common-idioms-lambda-expr",
-                            encoder=snap,
-                            mode=mode,
-                        )
-                    ), error()
+                check_snapshot(e.exception, "common-idioms-lambda-expr", mode=mode)
 
             with Test("getitem"):
                 with raises(AssertionError) as e:
                     assert {"a": 1}["a"] is False, error()
                 note(e.exception)
-                with values() as that:
-                    assert that(
-                        snapshot(
-                            e.exception,
-                            "common-idioms-getitem",
-                            encoder=snap,
-                            mode=mode,
-                        )
-                    ), error()
+                check_snapshot(e.exception, "common-idioms-getitem", mode=mode)
 
             with Test("generator expression"):
 
@@ -931,75 +666,45 @@ def regression(self, mode=snapshot.CHECK):
                         is False
                     ), error()
                 note(e.exception)
-                with values() as that:
-                    assert that(
-                        snapshot(
-                            e.exception,
-                            "common-idioms-list-comprehension",
-                            encoder=snap,
-                            mode=mode,
-                        )
-                    ), error()
+                check_snapshot(
+                    e.exception, "common-idioms-list-comprehension", mode=mode
+                )
 
             with Test("set comprehension"):
                 with raises(AssertionError) as e, values() as that:
                     f = 5
                     assert {that(x) for x in range(f)} is False, error()
                 note(e.exception)
-                with values() as that:
-                    assert that(
-                        snapshot(
-                            e.exception,
-                            "common-idioms-set-comprehension",
-                            encoder=snap,
-                            mode=mode,
-                        )
-                    ), error()
+                check_snapshot(
+                    e.exception, "common-idioms-set-comprehension", mode=mode
+                )
 
             with Test("dict comprehension"):
                 with raises(AssertionError) as e, values() as that:
                     f, g = 2, 3
                     assert {that(x): x * f for x in range(g)} is False, error()
                 note(e.exception)
-                with values() as that:
-                    assert that(
-                        snapshot(
-                            e.exception,
-                            "common-idioms-dict-comprehension",
-                            encoder=snap,
-                            mode=mode,
-                        )
-                    ), error()
+                check_snapshot(
+                    e.exception, "common-idioms-dict-comprehension", mode=mode
+                )
 
             with Test("chained comparison"):
                 with raises(AssertionError) as e:
                     x = 2
                     assert 1 >= x <= 3 <= 10, error()
                 note(e.exception)
-                with values() as that:
-                    assert that(
-                        snapshot(
-                            e.exception,
-                            "common-idioms-chained-comparison",
-                            encoder=snap,
-                            mode=mode,
-                        )
-                    ), error()
+                check_snapshot(
+                    e.exception, "common-idioms-chained-comparison", mode=mode
+                )
 
             with Test("chained str comparison"):
                 with raises(AssertionError) as e:
                     x = "bbb"
                     assert "a" == x <= "ccc" <= "ddd", error()
                 note(e.exception)
-                with values() as that:
-                    assert that(
-                        snapshot(
-                            e.exception,
-                            "common-idioms-chained-str-comparison",
-                            encoder=snap,
-                            mode=mode,
-                        )
-                    ), error()
+                check_snapshot(
+                    e.exception, "common-idioms-chained-str-comparison", mode=mode
+                )
 
 
 if main():